@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Synthetic data generator and benchmarks for cals.py"""
+
+import io
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import sqlite3
+import statistics
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+from time import perf_counter
+import cals
+
+FOODS = [('egg', 63, 7), ('Protein Bar', 190, 16), ('Tofu Salad', 500, 7),
+         ('Soup', 190, 15), ('Beer', 200, 0), ('Olives', 50, 0),
+         ('Oatmeal', 150, 5), ('Chicken Breast', 280, 53), ('Apple', 95, 0),
+         ('Shake', 160, 30)]
+
+
+def parse_args(args):
+    """Define and parse args"""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="bench_cals -- benchmark cals against synthetic data",
+        epilog="""Usage examples:\n
+    Benchmark 10 years of history for 2 users, save results:
+    \tpython3 bench_cals.py --years 10 --users 2 -o new.json\n
+    Compare against results from a previous version:
+    \tpython3 bench_cals.py -o new.json --compare old.json""")
+    parser.add_argument(
+        "--years", type=int, default=5, help="years of history per user")
+    parser.add_argument(
+        "--users", type=int, default=1, help="number of user dbs to generate")
+    parser.add_argument(
+        "--per-day", type=int, default=5, help="calorie entries per day")
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed for generated data")
+    parser.add_argument(
+        "--rounds", type=int, default=20, help="timed rounds per benchmark")
+    parser.add_argument(
+        "-o", metavar="FILE", help="write results to FILE as json")
+    parser.add_argument(
+        "--compare", metavar="FILE", help="compare results against json FILE")
+    return parser.parse_args(args)
+
+
+def use_db(db):
+    """Point cals at $db"""
+    cals.db = db
+    cals.cursor = db.cursor()
+    cals.archive_before = None
+
+
+def generate(db, years, per_day, seed, end=cals.date):
+    """Fill calorie, weight and profile tables of $db with $years of history ending at $end"""
+    use_db(db)
+    for table in 'calorie_table', 'weight_table', 'profile_table':
+        cals.create_table(db, table)
+    rand = random.Random(seed)
+    start = end - timedelta(days=365 * years)
+    days = [start + timedelta(days=n) for n in range((end - start).days)]
+
+    def calorie_rows():
+        for day in days:
+            for n in range(per_day):
+                food, cal, prot = rand.choice(FOODS)
+                yield food, cal, prot, f"{7 + n * 14 // per_day:02}:00:00", f"{day}"
+
+    def weight_rows():
+        weight = rand.uniform(150, 250)
+        for day in days[::7]:
+            weight += rand.uniform(-2, 1)
+            yield round(weight, 1), '07:00:00', f"{day}"
+
+    goal = rand.randrange(1500, 2500)
+    with db:
+        db.executemany(
+            "INSERT INTO calorie_table VALUES (?,?,?,?,?)", calorie_rows())
+        db.executemany("INSERT INTO weight_table VALUES (?,?,?)", weight_rows())
+        db.execute("INSERT INTO profile_table VALUES (?,?,?,?,?,?,?,?,?,?)",
+                   [1] + [goal] * 7 + ['07:00:00', f"{start}"])
+
+
+def bench(name, func, dbs, rounds, setup=None):
+    """Time $func over $rounds, cycling through user $dbs, and return stats"""
+    times = []
+    for n in range(rounds):
+        use_db(dbs[n % len(dbs)])
+        if setup:
+            setup()
+        with redirect_stdout(io.StringIO()):
+            start = perf_counter()
+            func()
+            times.append(perf_counter() - start)
+    return {
+        'name': name,
+        'stats': {
+            'min': min(times),
+            'max': max(times),
+            'mean': statistics.mean(times),
+            'stddev': statistics.stdev(times) if len(times) > 1 else 0,
+            'median': statistics.median(times),
+            'rounds': rounds,
+        }
+    }
+
+
+def bench_entry_points(dbs, rounds):
+    """Benchmark cals entry points against user $dbs"""
+    item = ['Protein Bar', 190, 16]
+
+    def add():
+        cals.args = argparse.Namespace(a=item, r=None)
+        record = cals.CalEntry()
+        for arg in item:
+            record.add(arg)
+        return record
+
+    def init():
+        sys.stdin = io.StringIO('30\nm\n5.9\n180\n3\n1\n')
+        try:
+            cals.init_profile(False)
+        finally:
+            sys.stdin = sys.__stdin__
+
+    return [
+        bench('commit_cals', lambda: add().commit_cals(), dbs, rounds),
+        bench('remove_cals', lambda: add().remove_cals(), dbs, rounds,
+              setup=lambda: add().commit_cals()),
+        bench('print_days', lambda: cals.print_days(30), dbs, rounds),
+        bench('display_weight_table', cals.display_weight_table, dbs, rounds),
+        bench('export_cals', lambda: cals.export_cals(cals.db), dbs, rounds),
+        bench('status', lambda: cals.print_status(cals.db), dbs, rounds),
+        bench('init', init, dbs, rounds),
+    ]
+
+
+def load_rows(db):
+    """Load calorie_table the way the query paths do: tuples with date objects"""
+    rows = db.execute("SELECT * FROM calorie_table ORDER BY Date, Time")
+    return [list(row[:4]) + [date.fromisoformat(row[4])] for row in rows]
+
+
+def measure(func, *args):
+    """Return result of $func and bytes still allocated for it"""
+    tracemalloc.start()
+    result = func(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def bench_memory(db):
+    """Return bytes per entry for row and columnar loading of $db"""
+    rows, row_bytes = measure(load_rows, db)
+    num = len(rows)
+    del rows
+    columns, col_bytes = measure(cals.load_calorie_columns, db)
+    assert len(columns) == num
+    return {'entries': num, 'rows': row_bytes / num, 'columns': col_bytes / num}
+
+
+def compare(results, path):
+    """Print median times of $results relative to results in $path"""
+    with open(path) as f:
+        old = {b['name']: b['stats'] for b in json.load(f)['benchmarks']}
+    print(f"\nCompared to '{path}':")
+    for b in results['benchmarks']:
+        if b['name'] in old:
+            ratio = b['stats']['median'] / old[b['name']]['median']
+            print(f"\t{b['name']:<22}{ratio:6.2f}x")
+
+
+def run(args):
+    """Generate user dbs, run benchmarks and return results"""
+    with tempfile.TemporaryDirectory() as tmp:
+        dbs = []
+        for user in range(args.users):
+            db = sqlite3.connect(f"{tmp}/user{user}.db")
+            generate(db, args.years, args.per_day, args.seed + user)
+            dbs.append(db)
+        memory = bench_memory(dbs[0])
+        cwd = os.getcwd()
+        # export_cals writes to the working directory
+        os.chdir(tmp)
+        try:
+            benchmarks = bench_entry_points(dbs, args.rounds)
+        finally:
+            os.chdir(cwd)
+        for db in dbs:
+            db.close()
+    return {
+        'machine_info': {
+            'python_version': platform.python_version(),
+            'sqlite_version': sqlite3.sqlite_version,
+            'system': platform.system(),
+            'machine': platform.machine(),
+        },
+        'params': {
+            'years': args.years,
+            'users': args.users,
+            'per_day': args.per_day,
+            'seed': args.seed,
+        },
+        'memory': memory,
+        'benchmarks': benchmarks,
+    }
+
+
+def print_results(results):
+    """Print benchmark results"""
+    memory = results['memory']
+    print(f"Loaded {memory['entries']} entries")
+    print(f"\trows:    {memory['rows']:8.1f} bytes/entry")
+    print(f"\tcolumns: {memory['columns']:8.1f} bytes/entry")
+    print(f"\n{'Benchmark':<22}{'Min (ms)':>10}{'Median (ms)':>13}{'Max (ms)':>10}")
+    for b in results['benchmarks']:
+        stats = b['stats']
+        print(f"{b['name']:<22}{stats['min'] * 1000:>10.2f}"
+              f"{stats['median'] * 1000:>13.2f}{stats['max'] * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    args = parse_args(sys.argv[1:])
+    results = run(args)
+    print_results(results)
+    if args.o:
+        with open(args.o, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote results to '{args.o}'")
+    if args.compare:
+        compare(results, args.compare)
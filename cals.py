@@ -3,23 +3,24 @@
 
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 import argparse
 import sqlite3
-import pyfiglet
-import pandas as pd
-from rich.console import Console
-from rich.table import Table
+from array import array
 
 home = os.path.expanduser('~')
 date = datetime.now().date()
 today = date.strftime('%A')[:3]
 time = datetime.now().time().strftime('%H:%M:%S')
 ERROR = '\033[91m[ERROR]\033[00m'
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
 
 
 db = sqlite3.connect(f"{home}/.calorie_log.db")
 cursor = db.cursor()
+archive_path = f"{home}/.calorie_archive.db"
+# entries dated before this are in archive partitions, set by load_archive
+archive_before = None
 
 
 def parse_args(args):
@@ -37,7 +38,15 @@ def parse_args(args):
     Add a weight record of 142.7 to the table:
     \tcals -w 142.7\n
     Display weight log and total weight loss/gain:
-    \tcals -w""")
+    \tcals -w\n
+    Add a shake to a 'breakfast' meal and log it every weekday:
+    \tcals --meal breakfast 'Shake' 160 30
+    \tcals --schedule breakfast Mon,Tue,Wed,Thu,Fri
+    \tcals --tick\n
+    Print calories remaining today for a shell prompt:
+    \tcals --status\n
+    Move calorie entries from before 2022 to the archive:
+    \tcals --archive-before 2022-01-01""")
     parser.add_argument(
         "--init", help="calculate TDEE and set weekly weight loss goal", action="store_true")
     parser.add_argument(
@@ -52,6 +61,16 @@ def parse_args(args):
         "-w", nargs="?", type=float, const=1, help='input weight into weight log')
     parser.add_argument(
         "-x", help="export calorie history to csv", action="store_true")
+    parser.add_argument(
+        "--meal", nargs=4, action="store", help="add an item to a meal ['meal name' 'food name' calories protein]")
+    parser.add_argument(
+        "--schedule", nargs=2, action="store", help="log a meal on days ['meal name' daily|Mon,Wed,...]")
+    parser.add_argument(
+        "--tick", help="log scheduled meals due since last tick", action="store_true")
+    parser.add_argument(
+        "--status", help="print today's calorie progress on one line", action="store_true")
+    parser.add_argument(
+        "--archive-before", metavar="DATE", help="archive calorie entries before DATE (YYYY-MM-DD)")
 
     return parser.parse_args()
 
@@ -70,6 +89,8 @@ class Entry:
         Adds item to content list
     """
 
+    __slots__ = ('content',)
+
     def __init__(self):
         self.content = []
 
@@ -92,6 +113,8 @@ class CalEntry(Entry):
         Removes caloric entry from db
     """
 
+    __slots__ = ()
+
     def validate(self):
         """Validate caloric log entry for addition or removal"""
         option = 'a' if args.a else 'r'
@@ -109,6 +132,7 @@ class CalEntry(Entry):
             create_table(db, 'calorie_table')
             cursor.executemany("INSERT INTO calorie_table VALUES (?,?,?,?,?)",
                                (entry, ))
+            invalidate_status()
             db.commit()
 
     def remove_cals(self):
@@ -119,6 +143,7 @@ class CalEntry(Entry):
                 cursor.execute(
                     f"DELETE FROM calorie_table WHERE Date='{date}' AND Food_Name='{self.content[0]}' \
                     AND Calories='{self.content[1]}' AND Protein='{self.content[2]}'")
+                invalidate_status()
             except sqlite3.OperationalError as err:
                 print(f"{ERROR} {err}")
 
@@ -135,6 +160,8 @@ class WeightEntry(Entry):
         Commits weight entry to db
     """
 
+    __slots__ = ()
+
     def validate(self):
         """Validate weight log entry for addition to table"""
         usage = "Usage: cals -w 175"
@@ -164,6 +191,8 @@ class ProfileEntry(Entry):
         Commits goal cals entry to db
     """
 
+    __slots__ = ()
+
     def validate(self):
         """Validate weight log entry for addition to table"""
         assert len(self.content) == 10
@@ -177,6 +206,73 @@ class ProfileEntry(Entry):
             create_table(db, 'profile_table')
             cursor.executemany(
                 "INSERT INTO profile_table VALUES (?,?,?,?,?,?,?,?,?,?)", (entry, ))
+            invalidate_status()
+
+
+class MealEntry(Entry):
+    """
+    Entry subclass to represent an item of a recurring meal
+    ...
+    Methods
+    -------
+    validate():
+        Validate meal item for addition to table
+    commit_meal():
+        Commits meal item to db
+    """
+
+    __slots__ = ()
+
+    def validate(self):
+        """Validate meal item for addition to table"""
+        usage = "Usage: cals --meal breakfast 'protein bar' 200 20"
+        assert len(self.content) == 4, f"{usage}"
+        for n in 2, 3:
+            self.content[n] = int(self.content[n])
+
+    def commit_meal(self):
+        """Commit meal item to db"""
+        self.validate()
+        with db:
+            create_table(db, 'meal_table')
+            cursor.executemany(
+                "INSERT INTO meal_table VALUES (?,?,?,?)", (self.content, ))
+
+
+class ScheduleEntry(Entry):
+    """
+    Entry subclass to represent the days a meal is logged on
+    ...
+    Methods
+    -------
+    validate():
+        Validate meal schedule for addition to table
+    commit_schedule():
+        Commits meal schedule to db
+    """
+
+    __slots__ = ()
+
+    def validate(self):
+        """Validate meal schedule for addition to table"""
+        usage = "Usage: cals --schedule breakfast daily|Mon,Wed,Fri"
+        assert len(self.content) == 2, f"{usage}"
+        if self.content[1] == 'daily':
+            self.content[1] = ','.join(WEEKDAYS)
+        for day in self.content[1].split(','):
+            assert day in WEEKDAYS, f"{usage}"
+
+    def commit_schedule(self):
+        """Commit meal schedule to db, first due today"""
+        self.validate()
+        yesterday = date - timedelta(days=1)
+        with db:
+            create_table(db, 'schedule_table')
+            # rescheduling keeps the last logged day so nothing is logged twice
+            cursor.execute(
+                "INSERT INTO schedule_table VALUES (?,?,?) \
+                ON CONFLICT(Meal) DO UPDATE SET Days=excluded.Days",
+                (*self.content, f"{yesterday}"))
 
 
 class Profile:
@@ -307,12 +403,13 @@ class ZigZag(Diet):
 
 def calc_cals(day):
     """Calculate calorie and protein totals for $day"""
+    table = 'calorie_rollup' if is_archived(day) else 'calorie_table'
     with db:
         info = []
         for col in ['Calories', 'Protein']:
             i = 0
             cursor.execute(
-                f"SELECT {col} FROM calorie_table WHERE Date='{day}'")
+                f"SELECT {col} FROM {table} WHERE Date='{day}'")
             rows = cursor.fetchall()
             for row in rows:
                 i = i + row[0]
@@ -334,8 +431,13 @@ def print_days(num):
     """Print multiple caloric logs"""
     with db:
         try:
-            cursor.execute(
-                f"SELECT DISTINCT Date FROM calorie_table ORDER BY Date DESC LIMIT {num}")
+            if archive_before:
+                cursor.execute(
+                    f"SELECT Date FROM calorie_table UNION SELECT Date FROM calorie_rollup \
+                    ORDER BY Date DESC LIMIT {num}")
+            else:
+                cursor.execute(
+                    f"SELECT DISTINCT Date FROM calorie_table ORDER BY Date DESC LIMIT {num}")
             days = cursor.fetchall()
             # loop backwards through days
             for day in days[::-1]:
@@ -347,10 +449,12 @@ def print_days(num):
 
 def print_daily_log(day):
     """Print caloric log for $day"""
+    from rich.console import Console
+    from rich.table import Table
     try:
         with db:
             cursor.execute(
-                f"SELECT Food_Name, Calories, Protein, Date FROM calorie_table WHERE Date='{day}'")
+                f"SELECT Food_Name, Calories, Protein, Date FROM {calorie_source(day)} WHERE Date='{day}'")
             rows = cursor.fetchall()
             try:
                 weekday = datetime.strptime(
@@ -390,11 +494,43 @@ def print_daily_log(day):
 \tFirst, please enter a food item to the table: `cals -a 'food' cals protein`")
 
 
+# status
+
+
+def invalidate_status():
+    """Drop cached status summaries, within the caller's transaction"""
+    cursor.execute("DROP TABLE IF EXISTS status_table")
+
+
+def print_status(db):
+    """Print one-line summary of today's calorie progress, cached until entries change"""
+    create_table(db, 'status_table')
+    try:
+        with db:
+            cursor.execute(
+                "SELECT Calories, Protein, Goal FROM status_table WHERE Date=?", (f"{date}", ))
+            summary = cursor.fetchone()
+            if summary is None:
+                create_table(db, 'calorie_table')
+                cals, protein = calc_cals(date)
+                summary = cals, protein, round(fetch_goal(today))
+                cursor.execute(
+                    "INSERT OR REPLACE INTO status_table VALUES (?,?,?,?)", (f"{date}", *summary))
+    except (sqlite3.OperationalError, IndexError) as err:
+        print(f"{ERROR} {err}\n\tNo calorie goal set.\n\
+\tFirst, please calculate a goal: `cals --init`")
+        return
+    cals, protein, goal = summary
+    print(f"date={date} calories={cals} protein={protein} goal={goal} remaining={goal - cals}")
+
+
 # weight logs
 
 
 def display_weight_table():
     """Fetch weight data from db and display table with weight progress"""
+    from rich.console import Console
+    from rich.table import Table
     weight_log = Table(title="Weight Log")
     for col in 'Date', 'Weight':
         weight_log.add_column(f"{col}", justify="right", no_wrap=True)
@@ -427,6 +563,110 @@ def calc_weight_loss():
         weight_loss = weights[0][0] - weights[-1][0]
         return weight_loss
 
+# analytics
+
+
+class CalorieColumns:
+    """
+    A class to represent calorie history as typed columns for bulk analytics
+    ...
+    Attributes
+    ----------
+    days : array('i')
+        proleptic Gregorian ordinal of each entry's date
+    calories : array('i')
+        calories of each entry
+    protein : array('f')
+        protein (g) of each entry
+    food_ids : array('i')
+        index of each entry's food name in $foods
+    foods : list
+        distinct food names, stored once each
+    Methods
+    -------
+    daily_totals():
+        Sum calories and protein per day
+    """
+
+    __slots__ = ('days', 'calories', 'protein', 'food_ids', 'foods')
+
+    def __init__(self):
+        self.days = array('i')
+        self.calories = array('i')
+        self.protein = array('f')
+        self.food_ids = array('i')
+        self.foods = []
+
+    def __len__(self):
+        return len(self.days)
+
+    def daily_totals(self):
+        """Sum calories and protein per day, ordered by day"""
+        days, cals, protein = array('i'), array('i'), array('f')
+        for day, cal, prot in zip(self.days, self.calories, self.protein):
+            if not days or days[-1] != day:
+                days.append(day)
+                cals.append(0)
+                protein.append(0)
+            cals[-1] += cal
+            protein[-1] += prot
+        return days, cals, protein
+
+
+class WeightColumns:
+    """
+    A class to represent weight history as typed columns
+    ...
+    Attributes
+    ----------
+    days : array('i')
+        proleptic Gregorian ordinal of each record's date
+    weights : array('f')
+        recorded weight
+    """
+
+    __slots__ = ('days', 'weights')
+
+    def __init__(self):
+        self.days = array('i')
+        self.weights = array('f')
+
+    def __len__(self):
+        return len(self.days)
+
+
+# julianday() of 0001-01-01 is 1721425.5, date.toordinal() of it is 1
+ORDINAL_SQL = "CAST(julianday(Date) - 1721424.5 AS INTEGER)"
+
+
+def load_calorie_columns(db):
+    """Load calorie_table into typed columns ordered by date and time"""
+    columns = CalorieColumns()
+    food_index = {}
+    rows = db.execute(
+        f"SELECT {ORDINAL_SQL}, Calories, Protein, Food_Name FROM {calorie_history()} \
+        ORDER BY Date, Time")
+    for day, cal, prot, food in rows:
+        columns.days.append(day)
+        columns.calories.append(cal)
+        columns.protein.append(prot)
+        if food not in food_index:
+            food_index[food] = len(columns.foods)
+            columns.foods.append(food)
+        columns.food_ids.append(food_index[food])
+    return columns
+
+
+def load_weight_columns(db):
+    """Load weight_table into typed columns ordered by date and time"""
+    columns = WeightColumns()
+    rows = db.execute(
+        f"SELECT {ORDINAL_SQL}, Weight FROM weight_table ORDER BY Date, Time")
+    for day, weight in rows:
+        columns.days.append(day)
+        columns.weights.append(weight)
+    return columns
+
 # db
 
 
@@ -460,14 +700,43 @@ def create_table(db, table):
                 Time TEXT,
                 Date TEXT)
                 """)
+        elif table == 'meal_table':
+            cursor.execute("""CREATE TABLE IF NOT EXISTS meal_table(
+                Meal TEXT,
+                Food_Name TEXT,
+                Calories INTEGER,
+                Protein INTEGER)
+                """)
+        elif table == 'schedule_table':
+            cursor.execute("""CREATE TABLE IF NOT EXISTS schedule_table(
+                Meal TEXT PRIMARY KEY,
+                Days TEXT,
+                Last_Logged TEXT)
+                """)
+        elif table == 'status_table':
+            cursor.execute("""CREATE TABLE IF NOT EXISTS status_table(
+                Date TEXT PRIMARY KEY,
+                Calories INTEGER,
+                Protein INTEGER,
+                Goal INTEGER)
+                """)
+        elif table == 'calorie_rollup':
+            cursor.execute("""CREATE TABLE IF NOT EXISTS calorie_rollup(
+                Date TEXT PRIMARY KEY,
+                Calories INTEGER,
+                Protein INTEGER,
+                Entries INTEGER)
+                """)
         else:
             print(f"{ERROR} No table to create: {table}")
 
 
 def export_cals(db):
     """Convert calorie table to pandas df and export to csv"""
+    import pandas as pd
     try:
-        calorie_df = pd.read_sql_query("SELECT * FROM calorie_table", db)
+        calorie_df = pd.read_sql_query(
+            f"SELECT * FROM {calorie_history()} ORDER BY Date, Time", db)
         calorie_df.to_csv(
             f'./calorie_logs-{date}-{time}.csv', index=False)
         print(
@@ -476,8 +745,137 @@ def export_cals(db):
         print(f"{ERROR} Export failed: {err}\033[0m")
 
 
+# archive
+
+
+def is_archived(day):
+    """Check if entries for $day have been moved to the archive"""
+    return archive_before is not None and f"{day}" < archive_before
+
+
+def calorie_source(day):
+    """Return table holding raw calorie entries for $day"""
+    if is_archived(day):
+        return f"archive.calorie_{f'{day}'[:7].replace('-', '_')}"
+    return 'calorie_table'
+
+
+def calorie_history():
+    """Return table or view holding all raw calorie entries"""
+    return 'calorie_history' if archive_before else 'calorie_table'
+
+
+def attach_archive(db):
+    """Attach archive db, if it exists, to $db"""
+    if os.path.exists(archive_path):
+        cursor.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+        load_archive(db)
+
+
+def load_archive(db):
+    """Read archive cutoff and create view spanning hot and archived entries"""
+    global archive_before
+    with db:
+        cursor.execute("SELECT MAX(Before) FROM archive.archive_meta")
+        archive_before = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT name FROM archive.sqlite_master WHERE type='table' \
+            AND name GLOB 'calorie_[0-9]*' ORDER BY name")
+        partitions = [row[0] for row in cursor.fetchall()]
+        create_table(db, 'calorie_table')
+        selects = ["SELECT * FROM main.calorie_table"] + \
+            [f"SELECT * FROM archive.{partition}" for partition in partitions]
+        cursor.execute("DROP VIEW IF EXISTS temp.calorie_history")
+        cursor.execute(
+            f"CREATE TEMP VIEW calorie_history AS {' UNION ALL '.join(selects)}")
+
+
+def archive_cals(db, before):
+    """Move calorie entries dated before $before into monthly archive partitions"""
+    try:
+        cutoff = datetime.strptime(before, '%Y-%m-%d').date()
+        assert cutoff <= date, "Cannot archive entries from today or later"
+    except (ValueError, AssertionError) as err:
+        print(f"{ERROR} {err}\n\tUsage: cals --archive-before 2022-01-01")
+        return
+    before = f"{cutoff}"
+    create_table(db, 'calorie_table')
+    create_table(db, 'calorie_rollup')
+    cursor.execute("PRAGMA database_list")
+    if 'archive' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    with db:
+        cursor.execute("""CREATE TABLE IF NOT EXISTS archive.archive_meta(
+            Before TEXT,
+            Time TEXT,
+            Date TEXT)
+            """)
+        cursor.execute(
+            "SELECT DISTINCT substr(Date, 1, 7) FROM calorie_table WHERE Date < ?", (before, ))
+        months = [row[0] for row in cursor.fetchall()]
+        for month in months:
+            partition = f"archive.calorie_{month.replace('-', '_')}"
+            cursor.execute(f"""CREATE TABLE IF NOT EXISTS {partition}(
+                Food_Name TEXT,
+                Calories INTEGER,
+                Protein INTEGER,
+                Time TEXT,
+                Date TEXT)
+                """)
+            cursor.execute(
+                f"INSERT INTO {partition} SELECT * FROM calorie_table \
+                WHERE substr(Date, 1, 7) = ? AND Date < ? ORDER BY Date, Time", (month, before))
+        cursor.execute(
+            "INSERT OR REPLACE INTO calorie_rollup SELECT Date, SUM(Calories), SUM(Protein), COUNT(*) \
+            FROM calorie_table WHERE Date < ? GROUP BY Date", (before, ))
+        cursor.execute("DELETE FROM calorie_table WHERE Date < ?", (before, ))
+        moved = cursor.rowcount
+        cursor.execute("INSERT INTO archive.archive_meta VALUES (?,?,?)",
+                       (max(before, archive_before or before), time, date))
+    # compact both files and refresh planner statistics outside of a transaction
+    for statement in "VACUUM main", "VACUUM archive", "ANALYZE":
+        cursor.execute(statement)
+    load_archive(db)
+    print(f"Archived {moved} entries dated before {before} to '{archive_path}'")
+
+
+# meals
+
+
+def tick(db):
+    """Log scheduled meals for every due day since the last tick"""
+    for table in 'calorie_table', 'meal_table', 'schedule_table':
+        create_table(db, table)
+    with db:
+        # lock before reading so concurrent ticks cannot log the same days
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT Meal, Food_Name, Calories, Protein FROM meal_table")
+        items = {}
+        for meal, *item in cursor.fetchall():
+            items.setdefault(meal, []).append(item)
+        cursor.execute("SELECT Meal, Days, Last_Logged FROM schedule_table")
+        schedules = cursor.fetchall()
+        rows = []
+        for meal, days, last in schedules:
+            day = datetime.strptime(last, '%Y-%m-%d').date() + timedelta(days=1)
+            # archived days are read-only
+            if archive_before:
+                day = max(day, datetime.strptime(archive_before, '%Y-%m-%d').date())
+            while day <= date:
+                if WEEKDAYS[day.weekday()] in days.split(','):
+                    rows.extend(item + [time, f"{day}"] for item in items.get(meal, []))
+                day += timedelta(days=1)
+        cursor.executemany("INSERT INTO calorie_table VALUES (?,?,?,?,?)", rows)
+        if rows:
+            invalidate_status()
+        cursor.execute(
+            "UPDATE schedule_table SET Last_Logged=? WHERE Last_Logged<?", (f"{date}", f"{date}"))
+    print(f"Logged {len(rows)} scheduled entries")
+
+
 def logo():
     """Print script logo"""
+    import pyfiglet
     pyfiglet.print_figlet("CalCount")
     print("Keep track of calories, protein, and weight loss/gain.\n")
 
@@ -532,8 +930,27 @@ def to_metric(ft_in, lbs):
     return cm, kg
 
 
+def init_profile(zigzag):
+    """Get profile from user input and commit weekly calorie plan to db"""
+    user_data = get_profile()
+    profile = Profile(*user_data)
+    record = ProfileEntry()
+    if zigzag:
+        diet = ZigZag(profile.tdee, profile.lose)
+        cal_arr = diet.calc_zigzag()
+    else:
+        diet = Diet(profile.tdee, profile.lose)
+        cal_arr = [diet.calories] * 7
+    items = [profile.lose] + cal_arr
+    for item in items:
+        record.add(item)
+    record.commit_profile()
+
+
 def print_cal_plan():
     """Print weekly calorie plan"""
+    from rich.console import Console
+    from rich.table import Table
     table = Table(title="Weekly Plan")
     for col in 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun':
         table.add_column(f"{col}", justify="right", no_wrap=True)
@@ -552,21 +969,10 @@ def print_cal_plan():
 
 if __name__ == '__main__':
     args = parse_args(sys.argv[1:])
+    attach_archive(db)
     if args.init:
         logo()
-        user_data = get_profile()
-        profile = Profile(*user_data)
-        record = ProfileEntry()
-        if args.z:
-            diet = ZigZag(profile.tdee, profile.lose)
-            cal_arr = diet.calc_zigzag()
-        else:
-            diet = Diet(profile.tdee, profile.lose)
-            cal_arr = [diet.calories] * 7
-        items = [profile.lose] + cal_arr
-        for item in items:
-            record.add(item)
-        record.commit_profile()
+        init_profile(args.z)
     if args.a or args.r:
         print_cal_plan()
         record = CalEntry()
@@ -593,3 +999,19 @@ if __name__ == '__main__':
             display_weight_table()
     if args.x:
         export_cals(db)
+    if args.meal:
+        record = MealEntry()
+        for arg in args.meal:
+            record.add(arg)
+        record.commit_meal()
+    if args.schedule:
+        record = ScheduleEntry()
+        for arg in args.schedule:
+            record.add(arg)
+        record.commit_schedule()
+    if args.tick:
+        tick(db)
+    if args.status:
+        print_status(db)
+    if args.archive_before:
+        archive_cals(db, args.archive_before)
@@ -2,8 +2,10 @@
 import pytest
 from io import StringIO
 import cals
+import bench_cals
 import sqlite3
 import datetime
+import argparse
 
 
 @pytest.fixture
@@ -14,6 +16,18 @@ def memory_db():
     yield db, cursor
 
 
+@pytest.fixture
+def cals_db(tmp_path, monkeypatch):
+    """Fixture to point cals at a temporary db and archive"""
+    db = sqlite3.connect(tmp_path / 'calorie_log.db')
+    monkeypatch.setattr(cals, 'db', db)
+    monkeypatch.setattr(cals, 'cursor', db.cursor())
+    monkeypatch.setattr(cals, 'archive_path', f"{tmp_path}/calorie_archive.db")
+    monkeypatch.setattr(cals, 'archive_before', None)
+    yield db
+    db.close()
+
+
 def test_Entry():
     """Verify that Entry class and add method behave as expected"""
     data = ['a', 1, (1, 2), -1, .5]
@@ -166,3 +180,133 @@ def test_calc_goal(monkeypatch):
     test_prof = cals.Profile(*data)
     diet = cals.Diet(test_prof.tdee, test_prof.lose)
     assert int(diet.calories) == -105
+
+
+def test_load_calorie_columns(memory_db):
+    """Verify that calorie_table loads into typed columns and sums per day"""
+    db, cursor = memory_db
+    cursor.execute("""CREATE TABLE calorie_table(
+        Food_Name TEXT, Calories INTEGER, Protein INTEGER, Time TEXT, Date TEXT)""")
+    rows = [('egg', 60, 6, '08:00:00', '2022-05-03'),
+            ('bar', 190, 16, '12:00:00', '2022-05-03'),
+            ('egg', 60, 6, '08:00:00', '2022-05-04')]
+    cursor.executemany("INSERT INTO calorie_table VALUES (?,?,?,?,?)", rows)
+    columns = cals.load_calorie_columns(db)
+    assert len(columns) == 3
+    assert columns.days[0] == datetime.date(2022, 5, 3).toordinal()
+    assert list(columns.calories) == [60, 190, 60]
+    assert columns.foods == ['egg', 'bar']
+    assert list(columns.food_ids) == [0, 1, 0]
+    days, cals_, protein = columns.daily_totals()
+    assert list(days) == [datetime.date(2022, 5, 3).toordinal(),
+                          datetime.date(2022, 5, 4).toordinal()]
+    assert list(cals_) == [250, 60]
+    assert list(protein) == [22, 6]
+
+
+def test_load_weight_columns(memory_db):
+    """Verify that weight_table loads into typed columns"""
+    db, cursor = memory_db
+    cursor.execute(
+        "CREATE TABLE weight_table(Weight INTEGER, Time TEXT, Date TEXT)")
+    cursor.executemany("INSERT INTO weight_table VALUES (?,?,?)",
+                       [(149, '08:00:00', '2022-05-03'), (148.5, '08:00:00', '2022-05-04')])
+    columns = cals.load_weight_columns(db)
+    assert len(columns) == 2
+    assert columns.days[1] == datetime.date(2022, 5, 4).toordinal()
+    assert list(columns.weights) == [149, 148.5]
+
+
+def test_archive_cals(cals_db):
+    """Verify that archived entries move to partitions and remain queryable"""
+    cals.create_table(cals_db, 'calorie_table')
+    rows = [('egg', 60, 6, '08:00:00', '2022-01-03'),
+            ('bar', 190, 16, '12:00:00', '2022-01-03'),
+            ('soup', 100, 5, '12:00:00', '2022-02-10'),
+            ('egg', 60, 6, '08:00:00', '2022-03-01')]
+    with cals_db:
+        cals_db.executemany(
+            "INSERT INTO calorie_table VALUES (?,?,?,?,?)", rows)
+    cals.archive_cals(cals_db, '2022-03-01')
+    assert cals.archive_before == '2022-03-01'
+    assert cals_db.execute(
+        "SELECT COUNT(*) FROM calorie_table").fetchone()[0] == 1
+    assert cals.calorie_source('2022-01-03') == 'archive.calorie_2022_01'
+    assert cals.calorie_source('2022-03-01') == 'calorie_table'
+    assert cals_db.execute(
+        "SELECT COUNT(*) FROM archive.calorie_2022_02").fetchone()[0] == 1
+    assert cals.calc_cals('2022-01-03') == (250, 22)
+    assert cals.calc_cals('2022-03-01') == (60, 6)
+    assert cals_db.execute(
+        f"SELECT COUNT(*) FROM {cals.calorie_history()}").fetchone()[0] == 4
+    assert len(cals.load_calorie_columns(cals_db)) == 4
+    # an earlier cutoff must not shrink the archived range
+    cals.archive_cals(cals_db, '2022-02-01')
+    assert cals.archive_before == '2022-03-01'
+
+
+def test_generate(monkeypatch):
+    """Verify that generated data is deterministic for a seed"""
+    monkeypatch.setattr(cals, 'db', cals.db)
+    monkeypatch.setattr(cals, 'cursor', cals.cursor)
+    monkeypatch.setattr(cals, 'archive_before', None)
+
+    def generate(seed):
+        db = sqlite3.connect(':memory:')
+        bench_cals.generate(db, 1, 3, seed, end=datetime.date(2022, 5, 4))
+        return [db.execute(f"SELECT * FROM {table}").fetchall()
+                for table in ('calorie_table', 'weight_table', 'profile_table')]
+
+    first, second, other = generate(0), generate(0), generate(1)
+    assert first == second
+    assert first != other
+    assert len(first[0]) == 365 * 3
+    assert first[0][-1][4] == '2022-05-03'
+
+
+def test_tick(cals_db, monkeypatch):
+    """Verify that scheduled meals are logged once for each due day"""
+    monkeypatch.setattr(cals, 'date', datetime.date(2022, 5, 2))
+    for item in (['breakfast', 'egg', '63', '7'], ['breakfast', 'shake', '160', '30']):
+        record = cals.MealEntry()
+        for arg in item:
+            record.add(arg)
+        record.commit_meal()
+    record = cals.ScheduleEntry()
+    for arg in ['breakfast', 'Mon,Wed']:
+        record.add(arg)
+    record.commit_schedule()
+
+    def logged():
+        return cals_db.execute(
+            "SELECT Date, SUM(Calories) FROM calorie_table GROUP BY Date").fetchall()
+
+    cals.tick(cals_db)
+    cals.tick(cals_db)
+    assert logged() == [('2022-05-02', 223)]
+    # catch up on missed days, only logging scheduled weekdays
+    monkeypatch.setattr(cals, 'date', datetime.date(2022, 5, 9))
+    cals.tick(cals_db)
+    cals.tick(cals_db)
+    assert logged() == [('2022-05-02', 223), ('2022-05-04', 223),
+                        ('2022-05-09', 223)]
+
+
+def test_print_status(cals_db, monkeypatch, capsys):
+    """Verify that status is cached and refreshed when entries change"""
+    monkeypatch.setattr(cals, 'args', argparse.Namespace(a=True, r=None), raising=False)
+    record = cals.ProfileEntry()
+    for item in [1] + [2000] * 7:
+        record.add(item)
+    record.commit_profile()
+    cals.print_status(cals_db)
+    assert cals_db.execute(
+        "SELECT Calories, Goal FROM status_table").fetchall() == [(0, 2000)]
+    record = cals.CalEntry()
+    for item in ['egg', '63', '7']:
+        record.add(item)
+    record.commit_cals()
+    cals.print_status(cals_db)
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].endswith("calories=0 protein=0 goal=2000 remaining=2000")
+    assert out[1].endswith("calories=63 protein=7 goal=2000 remaining=1937")